@@ -1,6 +1,14 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, status
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
 import os
 
+from runtime_tuning import load_runtime_config, apply_runtime_env
+
+# A calibrated profile (see runtime_tuning.py) takes precedence over the
+# single-thread defaults below; explicit environment variables win over both.
+_runtime_config = load_runtime_config()
+apply_runtime_env(_runtime_config)
+
 os.environ.setdefault("OMP_NUM_THREADS", "1")
 os.environ.setdefault("MKL_NUM_THREADS", "1")
 os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
@@ -10,15 +18,69 @@ os.environ.setdefault("FLAGS_use_mkldnn", "0")
 from paddleocr import PaddleOCR
 import cv2, numpy as np, re
 import json
+import asyncio
 import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import httpx
+import msgpack
 import traceback
 from pydantic import BaseModel, Field, ValidationError
 
-app = FastAPI()
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+if isinstance(_runtime_config.get("opencv_threads"), int):
+    cv2.setNumThreads(_runtime_config["opencv_threads"])
+
+app = FastAPI(default_response_class=ORJSONResponse)
 _ocr = None
 _ocr_lock = threading.Lock()
 
+# PaddleOCR is not thread-safe, so OCR calls are serialized through a single slot
+# handed out by _ocr_scheduler and run on their own one-thread executor.
+# Decoding/preprocessing get a few slots of their own (_preprocess_scheduler), so
+# neither stage sits behind a bulk backlog in a shared FIFO thread pool.
+# Waiting for a slot is cancellable; work that has started runs to completion.
+_OCR_PRIORITY_WEIGHTS = {"interactive": 8, "bulk": 1}
+_OCR_PRIORITY_DEFAULT = "interactive"
+_PREPROCESS_SLOTS = min(4, os.cpu_count() or 1)
+# Uploads of one /ocr/batch request that may be in flight at once.
+_OCR_BATCH_CONCURRENCY = 2
+
+_ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+_preprocess_executor = ThreadPoolExecutor(max_workers=_PREPROCESS_SLOTS, thread_name_prefix="preprocess")
+
+_REQUEST_DEADLINE_DEFAULT_S = _env_float("OCR_REQUEST_DEADLINE_S", 60.0)
+_REQUEST_DEADLINE_MAX_S = 300.0
+_CANCEL_POLL_S = 0.2
+
+_cancel_stats: dict[str, int] = {}
+_cancel_stats_lock = threading.Lock()
+
+_llm_stats: dict[str, float] = {
+    "requests": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "latency_ms_total": 0.0,
+}
+_llm_stats_lock = threading.Lock()
+
+_quality_stats: dict[str, int] = {}
+_quality_stats_lock = threading.Lock()
+
 
 class BusinessCardLLM(BaseModel):
     name: str = ""
@@ -72,8 +134,75 @@ def _coerce_list_str(v) -> list[str]:
     return []
 
 
-async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
+_OPENAI_BASE_URL_DEFAULT = "https://api.openai.com/v1"
+_LLM_BATCH_SIZE = max(1, _env_int("OPENAI_BATCH_SIZE", 8))
+_LLM_BATCH_MAX_ATTEMPTS = 2
+# Chunks of one batch sent to the API at the same time.
+_LLM_BATCH_CONCURRENCY = max(1, _env_int("OPENAI_BATCH_CONCURRENCY", 4))
+
+# "json_schema" uses the API's structured outputs; "json_object" falls back to
+# JSON mode with a one-line key list for endpoints without schema support.
+_LLM_RESPONSE_FORMAT = os.getenv("OPENAI_RESPONSE_FORMAT", "json_schema").strip().lower() or "json_schema"
+# Confidence is only worth sending for lines the model should double-check.
+_LLM_CONF_THRESHOLD = 0.8
+
+_LLM_SYSTEM_PROMPT = (
+    "You extract fields from Japanese business card OCR lines. "
+    "Do not hallucinate; use \"\" or [] when unknown. "
+    "Lines ending with (?0.xx) have low OCR confidence. "
+    "A final 'resolved:' line lists URLs and e-mails already extracted; they are "
+    "added to the result for you, but use them as context (e.g. the company domain)."
+)
+
+
+def _llm_card_json_schema() -> dict:
+    props: dict[str, dict] = {}
+    for name, f in BusinessCardLLM.model_fields.items():
+        if f.annotation is str:
+            props[name] = {"type": "string"}
+        else:
+            props[name] = {"type": "array", "items": {"type": "string"}}
+    return {
+        "type": "object",
+        "properties": props,
+        "required": list(props),
+        "additionalProperties": False,
+    }
+
+
+_LLM_CARD_JSON_SCHEMA = _llm_card_json_schema()
+
+_LLM_CARD_KEYS_HINT = "Return a JSON object. Keys: {} (string); {} (string[]).".format(
+    ", ".join(k for k, v in _LLM_CARD_JSON_SCHEMA["properties"].items() if v["type"] == "string"),
+    ", ".join(k for k, v in _LLM_CARD_JSON_SCHEMA["properties"].items() if v["type"] == "array"),
+)
+
+
+def _llm_batch_json_schema() -> dict:
+    card = dict(_LLM_CARD_JSON_SCHEMA)
+    card["properties"] = {"card": {"type": "integer"}, **card["properties"]}
+    card["required"] = list(card["properties"])
+    return {
+        "type": "object",
+        "properties": {"cards": {"type": "array", "items": card}},
+        "required": ["cards"],
+        "additionalProperties": False,
+    }
+
+
+_LLM_BATCH_JSON_SCHEMA = _llm_batch_json_schema()
+
 
+def _llm_response_format(name: str, schema: dict) -> dict:
+    if _LLM_RESPONSE_FORMAT == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": name, "strict": True, "schema": schema},
+        }
+    return {"type": "json_object"}
+
+
+def _openai_settings() -> tuple[str, str, str]:
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
     if not api_key:
         raise HTTPException(
@@ -82,59 +211,98 @@ async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
         )
 
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip() or "gpt-4o-mini"
+    # Overridable so the extraction can be pointed at a local mock endpoint.
+    base_url = os.getenv("OPENAI_BASE_URL", "").strip() or _OPENAI_BASE_URL_DEFAULT
+    return api_key, model, base_url.rstrip("/")
+
+
+_EMAIL_LINE_RE = re.compile(r"^(?:e-?mail|mail)?\s*[:：]?\s*([\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+)$", re.IGNORECASE)
+_URL_LINE_RE = re.compile(r"^(?:https?://|www\.)\S+$", re.IGNORECASE)
+_MOBILE_LINE_RE = re.compile(r"^0[789]0-\d{4}-\d{4}$")
 
+
+def _build_llm_lines(blocks: list[dict]) -> tuple[list[str], dict[str, list[str]]]:
+    """Build compact prompt lines for one card.
+
+    Lines that the local normalizers already resolved unambiguously (URLs,
+    e-mail addresses, mobile numbers) are returned separately so they can be
+    merged into the LLM result. In the prompt, URLs and e-mails are kept as a
+    single compact "resolved:" line, since their domain often names the
+    company; mobile numbers are left out.
+    """
     lines: list[str] = []
+    resolved: dict[str, list[str]] = {"urls": [], "emails": [], "mobiles": []}
     for b in blocks:
         t = (b.get("text") or "").strip()
         if not t:
             continue
+        if _URL_LINE_RE.match(t):
+            resolved["urls"].append(t)
+            continue
+        m = _EMAIL_LINE_RE.match(t)
+        if m:
+            resolved["emails"].append(m.group(1))
+            continue
+        if _MOBILE_LINE_RE.match(t):
+            resolved["mobiles"].append(t)
+            continue
         c = b.get("confidence")
-        if isinstance(c, (int, float)):
-            lines.append(f"{t} (conf={float(c):.2f})")
+        if isinstance(c, (int, float)) and float(c) < _LLM_CONF_THRESHOLD:
+            lines.append(f"{t} (?{float(c):.2f})")
         else:
             lines.append(t)
+    summary = [f"{key}={' '.join(resolved[key])}" for key in ("urls", "emails") if resolved[key]]
+    if summary:
+        lines.append("resolved: " + ", ".join(summary))
+    return lines, resolved
+
+
+def _merge_resolved(card: dict, resolved: dict[str, list[str]]) -> dict:
+    for key, values in resolved.items():
+        cur = list(card.get(key) or [])
+        seen = {v.lower() for v in cur}
+        for v in values:
+            if v.lower() not in seen:
+                cur.append(v)
+                seen.add(v.lower())
+        card[key] = cur
+    return card
+
+
+def _record_llm_usage(usage: dict, elapsed_ms: float):
+    prompt_tokens = usage.get("prompt_tokens") if isinstance(usage, dict) else None
+    completion_tokens = usage.get("completion_tokens") if isinstance(usage, dict) else None
+    with _llm_stats_lock:
+        _llm_stats["requests"] += 1
+        _llm_stats["prompt_tokens"] += int(prompt_tokens or 0)
+        _llm_stats["completion_tokens"] += int(completion_tokens or 0)
+        _llm_stats["latency_ms_total"] += elapsed_ms
+    try:
+        print(
+            f"OpenAI usage: prompt_tokens={prompt_tokens}, "
+            f"completion_tokens={completion_tokens}, elapsed_ms={elapsed_ms:.0f}"
+        )
+    except Exception:
+        pass
 
-    joined = "\n".join(lines)
-    system = (
-        "You are a careful Japanese business card information extractor. "
-        "Return ONLY valid JSON (no markdown)."
-    )
-    user = (
-        "Extract business card fields from the OCR lines below. "
-        "Do not hallucinate. If unknown, use empty string or empty list. "
-        "Output JSON with this schema:\n"
-        "{\n"
-        "  \"name\": \"\",\n"
-        "  \"company\": \"\",\n"
-        "  \"department\": \"\",\n"
-        "  \"title\": \"\",\n"
-        "  \"phones\": [],\n"
-        "  \"mobiles\": [],\n"
-        "  \"faxes\": [],\n"
-        "  \"emails\": [],\n"
-        "  \"urls\": [],\n"
-        "  \"postal_code\": \"\",\n"
-        "  \"address\": \"\",\n"
-        "  \"other\": []\n"
-        "}\n\n"
-        "OCR lines:\n"
-        f"{joined}"
-    )
+
+async def _openai_chat(messages: list[dict], response_format: dict | None = None) -> str:
+    api_key, model, base_url = _openai_settings()
 
     payload = {
         "model": model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
+        "messages": messages,
         "temperature": 0,
     }
+    if response_format is not None:
+        payload["response_format"] = response_format
 
     timeout = httpx.Timeout(45.0, connect=15.0)
+    t0 = time.monotonic()
     try:
         async with httpx.AsyncClient(timeout=timeout) as client:
             r = await client.post(
-                "https://api.openai.com/v1/chat/completions",
+                f"{base_url}/chat/completions",
                 headers={
                     "Authorization": f"Bearer {api_key}",
                     "Content-Type": "application/json",
@@ -177,6 +345,8 @@ async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
             detail=f"OpenAI response JSON parse failed: {body_snip}",
         )
 
+    _record_llm_usage(data.get("usage") or {}, (time.monotonic() - t0) * 1000.0)
+
     content = (
         ((data.get("choices") or [{}])[0].get("message") or {}).get("content") or ""
     ).strip()
@@ -185,7 +355,10 @@ async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="OpenAI API returned empty content",
         )
+    return content
+
 
+def _parse_llm_json_object(content: str) -> dict:
     parsed = None
     try:
         parsed = json.loads(content)
@@ -209,7 +382,10 @@ async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"OpenAI output JSON must be an object: got {type(parsed).__name__}",
         )
+    return parsed
 
+
+def _coerce_card(parsed: dict) -> dict | None:
     coerced = {
         "name": _coerce_str(parsed.get("name")),
         "company": _coerce_str(parsed.get("company")),
@@ -230,11 +406,347 @@ async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
         return validated.model_dump()
     except ValidationError as e:
         try:
-            print("OpenAI output schema validation failed (fallback to defaults):")
+            print("OpenAI output schema validation failed:")
             print(e)
         except Exception:
             pass
-        return BusinessCardLLM().model_dump()
+        return None
+
+
+def _llm_user_prompt(body: str) -> str:
+    if _LLM_RESPONSE_FORMAT == "json_schema":
+        return body
+    return f"{_LLM_CARD_KEYS_HINT}\n{body}"
+
+
+async def _openai_extract_card_from_blocks(blocks: list[dict]) -> dict:
+
+    lines, resolved = _build_llm_lines(blocks)
+    user = _llm_user_prompt("OCR lines:\n" + "\n".join(lines))
+
+    content = await _openai_chat(
+        [
+            {"role": "system", "content": _LLM_SYSTEM_PROMPT},
+            {"role": "user", "content": user},
+        ],
+        response_format=_llm_response_format("business_card", _LLM_CARD_JSON_SCHEMA),
+    )
+    card = _coerce_card(_parse_llm_json_object(content))
+    if card is None:
+        # Fall back to defaults rather than failing the whole request.
+        card = BusinessCardLLM().model_dump()
+    return _merge_resolved(card, resolved)
+
+
+def _llm_batch_user_prompt(cards: list[tuple[int, list[str]]]) -> str:
+    parts: list[str] = [
+        "Cards are separated by '=== card N ===' lines; never mix lines between cards. "
+        "Return {\"cards\": [...]} with one entry per card, each with \"card\": N."
+    ]
+    for idx, lines in cards:
+        parts.append(f"=== card {idx} ===")
+        parts.extend(lines)
+    return _llm_user_prompt("\n".join(parts))
+
+
+def _split_llm_batch_output(parsed: dict, indices: list[int]) -> dict[int, dict]:
+    entries = parsed.get("cards")
+    if not isinstance(entries, list):
+        return {}
+
+    out: dict[int, dict] = {}
+    for pos, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        idx = entry.get("card")
+        if isinstance(idx, str) and idx.strip().isdigit():
+            idx = int(idx.strip())
+        if not isinstance(idx, int) or isinstance(idx, bool):
+            # Fall back to position only when the model kept the card count.
+            if len(entries) != len(indices):
+                continue
+            idx = indices[pos]
+        if idx in indices and idx not in out:
+            out[idx] = entry
+    return out
+
+
+async def _openai_extract_cards_batch(cards_blocks: list[list[dict]]) -> list[tuple[dict | None, dict | None]]:
+    """Extract several cards with one chat completion per chunk.
+
+    Returns one (llm, llm_error) pair per input card, in input order. Chunks of
+    _LLM_BATCH_SIZE cards are sent concurrently (up to _LLM_BATCH_CONCURRENCY at
+    a time). Only cards whose entry is missing or unusable are re-submitted in
+    the next attempt, batched together in chunks of _LLM_BATCH_SIZE.
+    """
+    results: list[tuple[dict | None, dict | None]] = [(None, None)] * len(cards_blocks)
+    pending = list(range(len(cards_blocks)))
+    errors: dict[int, dict] = {}
+
+    size = _LLM_BATCH_SIZE
+    built = [_build_llm_lines(blocks) for blocks in cards_blocks]
+    sem = asyncio.Semaphore(_LLM_BATCH_CONCURRENCY)
+
+    async def run_chunk(attempt: int, chunk: list[int]) -> list[int]:
+        failed: list[int] = []
+        async with sem:
+            t0 = time.monotonic()
+            try:
+                content = await _openai_chat(
+                    [
+                        {"role": "system", "content": _LLM_SYSTEM_PROMPT},
+                        {"role": "user", "content": _llm_batch_user_prompt([(idx, built[idx][0]) for idx in chunk])},
+                    ],
+                    response_format=_llm_response_format("business_cards", _LLM_BATCH_JSON_SCHEMA),
+                )
+                entries = _split_llm_batch_output(_parse_llm_json_object(content), chunk)
+            except HTTPException as e:
+                if e.status_code == status.HTTP_400_BAD_REQUEST:
+                    # Configuration errors won't go away on retry.
+                    raise
+                for idx in chunk:
+                    errors[idx] = {
+                        "status_code": int(e.status_code or 0),
+                        "detail": e.detail,
+                        "type": type(e).__name__,
+                    }
+                return list(chunk)
+
+        for idx in chunk:
+            entry = entries.get(idx)
+            card = _coerce_card(entry) if entry is not None else None
+            if card is None:
+                errors[idx] = {
+                    "status_code": status.HTTP_502_BAD_GATEWAY,
+                    "detail": "OpenAI batch output is missing or invalid for this card",
+                    "type": "HTTPException",
+                }
+                failed.append(idx)
+            else:
+                errors.pop(idx, None)
+                results[idx] = (_merge_resolved(card, built[idx][1]), None)
+        try:
+            print(
+                f"OpenAI batch: attempt={attempt + 1}, cards={len(chunk)}, "
+                f"failed={len(failed)}, "
+                f"elapsed_ms={(time.monotonic() - t0) * 1000.0:.0f}"
+            )
+        except Exception:
+            pass
+        return failed
+
+    for attempt in range(_LLM_BATCH_MAX_ATTEMPTS):
+        if not pending:
+            break
+        # Chunks are independent, so send them concurrently; a large import
+        # then takes about as long as its slowest chunk, not their sum.
+        outcomes = await asyncio.gather(
+            *(run_chunk(attempt, pending[i:i + size]) for i in range(0, len(pending), size)),
+            return_exceptions=True,
+        )
+        failed: list[int] = []
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+            failed.extend(outcome)
+        pending = sorted(failed)
+
+    for idx in pending:
+        results[idx] = (None, errors.get(idx))
+    return results
+
+
+class RequestCancelled(HTTPException):
+    def __init__(self, reason: str, stage: str):
+        code = 499 if reason == "disconnected" else status.HTTP_504_GATEWAY_TIMEOUT
+        super().__init__(status_code=code, detail=f"Request cancelled ({reason}) during {stage}")
+        self.reason = reason
+        self.stage = stage
+
+
+def _count_cancel(reason: str, stage: str):
+    key = f"{reason}:{stage}"
+    with _cancel_stats_lock:
+        _cancel_stats[key] = _cancel_stats.get(key, 0) + 1
+
+
+def _parse_timeout_ms(v: str | None) -> float:
+    try:
+        t = float(v) / 1000.0 if v is not None and str(v).strip() else 0.0
+    except ValueError:
+        t = 0.0
+    if t <= 0:
+        t = _REQUEST_DEADLINE_DEFAULT_S
+    return min(t, _REQUEST_DEADLINE_MAX_S)
+
+
+class _RequestContext:
+    """Deadline and client-disconnect tracking for one /ocr request."""
+
+    def __init__(self, request: Request, timeout_s: float):
+        self.request = request
+        self.deadline = time.monotonic() + timeout_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    async def cancel_reason(self) -> str | None:
+        if time.monotonic() >= self.deadline:
+            return "deadline"
+        if await self.request.is_disconnected():
+            return "disconnected"
+        return None
+
+    async def check(self, stage: str):
+        reason = await self.cancel_reason()
+        if reason is not None:
+            _count_cancel(reason, stage)
+            raise RequestCancelled(reason, stage)
+
+    async def run(self, aw, stage: str):
+        # Await `aw`, cancelling it as soon as the client goes away or the deadline passes.
+        task = asyncio.ensure_future(aw)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=min(_CANCEL_POLL_S, self.remaining()))
+                if task in done:
+                    return task.result()
+                reason = await self.cancel_reason()
+                if reason is not None:
+                    task.cancel()
+                    _count_cancel(reason, stage)
+                    raise RequestCancelled(reason, stage)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+
+class _PriorityScheduler:
+    """Slot scheduler with weighted-fair queues per priority class.
+
+    Classes are served by stride scheduling: each grant advances the class's
+    pass by 1/weight and the non-empty class with the lowest pass goes next, so
+    interactive scans get ahead of a bulk backlog without starving it.
+    """
+
+    def __init__(self, weights: dict[str, int], slots: int = 1):
+        self.weights = dict(weights)
+        self.slots = max(1, slots)
+        self.queues: dict[str, deque] = {c: deque() for c in weights}
+        self.passes: dict[str, float] = {c: 0.0 for c in weights}
+        self.vclock = 0.0
+        self.in_use = 0
+        self.served: dict[str, int] = {c: 0 for c in weights}
+        self.waits: dict[str, deque] = {c: deque(maxlen=1000) for c in weights}
+
+    async def acquire(self, cls: str):
+        enqueued = time.monotonic()
+        if self.in_use < self.slots and not any(self.queues.values()):
+            self.in_use += 1
+            self._record(cls, enqueued)
+            return
+
+        q = self.queues[cls]
+        if not q:
+            # Don't let a class bank credit while it was idle.
+            self.passes[cls] = max(self.passes[cls], self.vclock)
+        fut = asyncio.get_running_loop().create_future()
+        entry = (fut, enqueued)
+        q.append(entry)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was granted just as we were cancelled; pass it on.
+                self.release()
+            else:
+                try:
+                    q.remove(entry)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        while True:
+            active = [c for c, q in self.queues.items() if q]
+            if not active:
+                self.in_use -= 1
+                return
+            cls = min(active, key=lambda c: self.passes[c])
+            fut, enqueued = self.queues[cls].popleft()
+            if fut.done():
+                continue
+            self.vclock = self.passes[cls]
+            self.passes[cls] += 1.0 / self.weights[cls]
+            self._record(cls, enqueued)
+            fut.set_result(None)
+            return
+
+    def _record(self, cls: str, enqueued: float):
+        self.served[cls] += 1
+        self.waits[cls].append(time.monotonic() - enqueued)
+
+    def stats(self) -> dict:
+        out = {}
+        for c in self.weights:
+            waits = sorted(self.waits[c])
+            n = len(waits)
+            out[c] = {
+                "weight": self.weights[c],
+                "depth": len(self.queues[c]),
+                "served": self.served[c],
+                "wait_p50_ms": round(waits[n // 2] * 1000.0, 1) if n else 0.0,
+                "wait_p99_ms": round(waits[min(n - 1, int(n * 0.99))] * 1000.0, 1) if n else 0.0,
+                "wait_max_ms": round(waits[-1] * 1000.0, 1) if n else 0.0,
+            }
+        return out
+
+
+_ocr_scheduler = _PriorityScheduler(_OCR_PRIORITY_WEIGHTS)
+_preprocess_scheduler = _PriorityScheduler(_OCR_PRIORITY_WEIGHTS, slots=_PREPROCESS_SLOTS)
+
+
+async def _run_prioritized(
+    scheduler: _PriorityScheduler,
+    executor: ThreadPoolExecutor,
+    ctx: _RequestContext,
+    prio: str,
+    queued_stage: str,
+    stage: str,
+    fn,
+    *args,
+):
+    await ctx.run(scheduler.acquire(prio), queued_stage)
+    try:
+        await ctx.check(stage)
+        # Not cancellable once started: the slot is held until the thread is done.
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        scheduler.release()
+
+
+def _parse_priority(v: str | None) -> str:
+    p = (v or "").strip().lower() or _OCR_PRIORITY_DEFAULT
+    if p not in _OCR_PRIORITY_WEIGHTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid priority: {v} (expected one of {', '.join(_OCR_PRIORITY_WEIGHTS)})",
+        )
+    return p
+
+
+def _run_ocr_sync(img: np.ndarray):
+    return _get_ocr().ocr(img)
+
+
+def _ocr_runtime_kwargs() -> dict:
+    kwargs = {}
+    threads = _runtime_config.get("intra_op_threads")
+    if isinstance(threads, int) and threads > 0:
+        kwargs["cpu_threads"] = threads
+    if isinstance(_runtime_config.get("mkldnn"), bool):
+        kwargs["enable_mkldnn"] = _runtime_config["mkldnn"]
+    return kwargs
 
 
 def _get_ocr():
@@ -243,7 +755,7 @@ def _get_ocr():
         return _ocr
     with _ocr_lock:
         if _ocr is None:
-            _ocr = PaddleOCR(use_angle_cls=True, lang="japan")
+            _ocr = PaddleOCR(use_angle_cls=True, lang="japan", **_ocr_runtime_kwargs())
     return _ocr
 
 
@@ -396,6 +908,158 @@ _PHONE_OCR_REPL = {
 }
 
 
+# Japanese numbering plan, as (prefix, digit groups) pairs. The groups give the
+# hyphenation and their sum the exact number length. Longer prefixes override
+# shorter ones, so a region's 3-digit area code can carry its 4/5-digit
+# exceptions underneath it.
+_JP_AREA_3 = {
+    "011": (),
+    "017": ("2", "3", "4", "5", "6", "8", "9"),
+    "018": ("2", "3", "4", "5", "6", "7"),
+    "019": ("1", "2", "3", "4", "5", "7", "8"),
+    "022": ("0", "3", "4", "5", "6", "8", "9"),
+    "023": ("3", "4", "5", "7", "8"),
+    "024": ("0", "1", "2", "3", "4", "6", "7", "8"),
+    "025": ("0", "4", "5", "6", "7", "8", "9"),
+    "026": ("0", "1", "3", "4", "5", "6", "7", "8", "9"),
+    "027": ("0", "4", "6", "7", "8", "9"),
+    "028": ("0", "2", "3", "4", "5", "7", "8", "9"),
+    "029": ("1", "3", "4", "5", "6", "7", "9"),
+    "042": ("2", "8"),
+    "043": ("6", "8", "9"),
+    "044": (),
+    "045": (),
+    "046": ("0", "3", "5", "6", "7"),
+    "047": ("0", "5", "6", "8", "9"),
+    "048": ("0",),
+    "049": ("3", "4", "5"),
+    "052": (),
+    "053": ("1", "2", "3", "6", "7", "8", "9"),
+    "054": ("4", "5", "7", "8"),
+    "055": ("0", "1", "3", "4", "5", "6", "7", "8"),
+    "058": ("1", "4", "5", "6", "7"),
+    "059": ("4", "5", "6", "7", "8", "9"),
+    "072": ("1", "5"),
+    "073": ("5", "6", "7", "8", "9"),
+    "075": (),
+    "076": ("1", "3", "5", "6", "7", "8"),
+    "077": ("0", "1", "2", "3", "4", "6", "8", "9"),
+    "078": (),
+    "079": ("0", "1", "4", "5", "6", "7", "8", "9"),
+    "082": ("0", "3", "4", "6", "7", "9"),
+    "083": ("3", "4", "5", "6", "7", "8"),
+    "084": ("5", "6", "7", "8"),
+    "086": ("3", "5", "6", "7", "8", "9"),
+    "087": ("5", "7", "9"),
+    "088": ("0", "3", "4", "5", "7", "9"),
+    "089": ("2", "3", "4", "5", "6", "7", "8"),
+    "092": ("0",),
+    "093": ("0",),
+    "095": ("0", "2", "4", "5", "6", "7", "9"),
+    "096": ("4", "5", "6", "7", "8", "9"),
+    "097": ("2", "3", "4", "7", "8", "9"),
+    "098": ("0", "2", "3", "4", "5", "6", "7"),
+    "099": ("3", "4", "5", "6", "7"),
+}
+
+# Exchanges under a 4-digit code that still belong to the 3-digit area beside
+# it (e.g. Kakogawa 079-42x next to Miki 0794-8x), and the few 6-digit
+# prefixes under those that fall back to the 4-digit code again.
+_JP_AREA_3_SHARED = (
+    "01548", "01557", "02234", "02235", "02236", "02237", "02238", "02239",
+    "02552", "02553", "02554", "02555", "02556", "02559", "02575", "02576",
+    "02577", "02578", "02579", "025999", "02646", "02647", "02648", "02649",
+    "02788", "02789", "02833", "02834", "02892", "02893", "02894", "02895",
+    "02935", "02936", "02937", "02938", "02939", "04284", "04285", "04286",
+    "04291", "04297", "04298", "04759", "04799", "05392", "05393", "05394",
+    "05395", "05396", "05397", "05398", "05989", "05999", "07942", "07943",
+    "07944", "07945", "07949", "07955", "07956", "07959", "07966", "07967",
+    "08242", "08243", "08249", "08292", "082941", "082942", "082943", "08296",
+    "08299", "083766", "083767", "083768", "08377", "08378", "08379", "083963",
+    "083966", "08636", "08652", "08653", "086552", "086553", "08658", "08659",
+    "086691", "086697", "086698", "08672", "086737", "086738", "08689", "08694",
+    "08695", "08699", "099331", "099343", "099345", "099347", "09947", "09948",
+)
+_JP_AREA_4_SHARED = (
+    "053960", "053961", "053962", "053963", "053974", "053977", "059797", "059798",
+    "082920", "086366", "086725", "086727", "086729", "086992", "086993",
+)
+
+_JP_AREA_5 = (
+    "01267", "01372", "01374", "01377", "01392", "01397", "01398", "01456",
+    "01457", "01466", "01547", "01558", "01564", "01586", "01587", "01632",
+    "01634", "01635", "01648", "01654", "01655", "01656", "01658", "04992",
+    "04994", "04996", "04998", "05769", "05979", "07468", "08387", "08388",
+    "08389", "08396", "08477", "08512", "08513", "08514", "08515", "08516",
+    "08517", "08518", "08519", "09802", "09912", "09913", "09969",
+)
+
+
+def _jp_phone_plan() -> list[tuple[str, tuple[int, ...]]]:
+    plan: list[tuple[str, tuple[int, ...]]] = []
+    # Fixed lines are always 10 digits: area code + local exchange make 6 digits,
+    # followed by a 4-digit subscriber number. Unlisted areas use 4-digit codes.
+    for p in ("01", "02", "04", "05", "07", "08", "09"):
+        plan.append((p, (4, 2, 4)))
+    for p in ("03", "06", "0429", "0471", "04709"):
+        plan.append((p, (2, 4, 4)))
+    for p, exceptions in _JP_AREA_3.items():
+        plan.append((p, (3, 3, 4)))
+        for x in exceptions:
+            plan.append((p + x, (4, 2, 4)))
+    for p in _JP_AREA_3_SHARED:
+        plan.append((p, (3, 3, 4)))
+    for p in _JP_AREA_4_SHARED:
+        plan.append((p, (4, 2, 4)))
+    for p in _JP_AREA_5:
+        plan.append((p, (5, 1, 4)))
+
+    # Non-geographic services.
+    for p in ("020", "050", "070", "080", "090"):
+        plan.append((p, (3, 4, 4)))
+    plan.append(("0120", (4, 3, 3)))
+    plan.append(("0800", (4, 3, 4)))
+    plan.append(("0570", (4, 2, 4)))
+    plan.append(("0180", (4, 2, 4)))
+    return plan
+
+
+def _build_phone_trie(plan: list[tuple[str, tuple[int, ...]]]) -> dict:
+    root: dict = {}
+    for prefix, groups in plan:
+        node = root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node[""] = groups
+    return root
+
+
+_JP_PHONE_TRIE = _build_phone_trie(_jp_phone_plan())
+
+
+def _phone_plan_groups(digits: str) -> tuple[int, ...] | None:
+    """Return the hyphenation groups for a valid JP number, or None."""
+    node = _JP_PHONE_TRIE
+    groups = None
+    for ch in digits:
+        node = node.get(ch)
+        if node is None:
+            break
+        groups = node.get("", groups)
+    if groups is None or sum(groups) != len(digits):
+        return None
+    return groups
+
+
+def _format_phone_digits(digits: str, groups: tuple[int, ...]) -> str:
+    parts: list[str] = []
+    i = 0
+    for n in groups:
+        parts.append(digits[i:i + n])
+        i += n
+    return "-".join(parts)
+
+
 def _phone_sanitize_for_digits(text: str) -> str:
     s = text.strip().translate(_FW_DIGITS)
     if not s:
@@ -416,28 +1080,35 @@ def _phone_digits_candidates(text: str) -> list[str]:
     s2 = _phone_sanitize_for_digits(s2)
     d2 = re.sub(r"\D", "", s2)
 
-    d3 = ""
-    d4 = ""
-    # Sometimes an extra leading digit is hallucinated (e.g. "4074355..." instead of "074355...").
-    # If dropping the first digit yields a plausible JP number, keep it as a candidate.
-    if d2 and len(d2) == 11 and d2.startswith("40"):
-        cand = d2[1:]
-        if cand.startswith("0") and len(cand) == 10:
-            d3 = cand
-
-    # Another common artifact: two extra leading digits (e.g. "43" + "0743...").
-    if d2 and len(d2) == 12 and d2.startswith("43"):
-        cand = d2[2:]
-        if cand.startswith("0") and len(cand) == 10:
-            d4 = cand
-
     out: list[str] = []
-    for d in (d1, d2, d3, d4):
+    for d in (d1, d2):
         if d and d not in out:
             out.append(d)
+
+    # Sometimes extra leading digits are hallucinated (e.g. "4074355..." or "43" + "0743...").
+    # If dropping them yields a valid JP number, keep it as a candidate.
+    for d in (d1, d2):
+        if not d or _phone_plan_groups(d) is not None:
+            continue
+        for k in (1, 2):
+            cand = d[k:]
+            if cand.startswith("0") and cand not in out and _phone_plan_groups(cand) is not None:
+                out.append(cand)
+                break
     return out
 
 
+def _phone_best_candidate(candidates: list[str]) -> tuple[str, tuple[int, ...] | None]:
+    # Prefer the first candidate that is a valid JP number; otherwise the longest (most information).
+    for d in candidates:
+        groups = _phone_plan_groups(d)
+        if groups is not None:
+            return d, groups
+    if not candidates:
+        return "", None
+    return max(candidates, key=len), None
+
+
 def _looks_like_phone(text: str) -> bool:
     s = _phone_sanitize_for_digits(text)
     if not s:
@@ -469,7 +1140,7 @@ def _looks_like_phone(text: str) -> bool:
     if re.search(r"\d{2,4}[-ー－―−]\d{2,4}[-ー－―−]\d{3,4}", s):
         return True
 
-    if digits.startswith("0") and len(digits) in (10, 11):
+    if any(_phone_plan_groups(d) is not None for d in digits_list):
         return True
 
     if s.startswith("+") and len(digits) >= 10:
@@ -498,17 +1169,7 @@ def _normalize_phone_text(text: str) -> str:
 
     m = re.match(r"^(\+)", s)
     plus = "+" if m else ""
-    digits_candidates = _phone_digits_candidates(text)
-    digits = ""
-    if digits_candidates:
-        # Prefer a candidate that can be formatted as 0570-xx-xxxx.
-        for d in digits_candidates:
-            if d.startswith("0570") and len(d) == 10:
-                digits = d
-                break
-        if not digits:
-            # Otherwise prefer the longest (most information).
-            digits = max(digits_candidates, key=len)
+    digits, groups = _phone_best_candidate(_phone_digits_candidates(text))
 
     if len(digits) < 9:
         # For 0570, allow shorter partials (e.g. OCR dropped last digits).
@@ -516,36 +1177,173 @@ def _normalize_phone_text(text: str) -> str:
             return digits
         return text.strip()
 
-    # Basic JP formatting heuristics.
     if plus:
         return plus + digits
 
-    if digits.startswith("0"):
-        # NTT Navi Dial formatting: 0570-xx-xxxx
-        if digits.startswith("0570") and len(digits) == 10:
-            return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
-        # Some JP area codes are 4 digits (e.g. 0743). Prefer 4-2-4 in such cases.
-        if digits.startswith("0743") and len(digits) == 10:
-            return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
-        if len(digits) == 10 and digits[:2] in ("03", "06"):
-            return f"{digits[:2]}-{digits[2:6]}-{digits[6:]}"
-        if len(digits) == 11 and digits[:3] in ("070", "080", "090"):
-            return f"{digits[:3]}-{digits[3:7]}-{digits[7:]}"
-        if len(digits) == 10:
-            return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
-        if len(digits) == 11:
-            return f"{digits[:3]}-{digits[3:7]}-{digits[7:]}"
+    if groups is not None:
+        return _format_phone_digits(digits, groups)
 
     # Fallback: return digit-only to avoid emitting broken punctuation.
     return digits
 
 
+# "enforce" rejects bad captures with a 422; "shadow" only logs and counts what
+# would have been rejected; "off" skips the check. Even when enforcing, the
+# reasons in _QUALITY_SHADOW_REASONS are only counted (as "shadow:<reason>")
+# until their thresholds are calibrated on real accepted captures; resolution
+# and darkness are unambiguous and rejected right away.
+_QUALITY_GATE_MODE = {
+    "1": "enforce", "true": "enforce", "on": "enforce", "enforce": "enforce",
+    "shadow": "shadow",
+    "0": "off", "false": "off", "no": "off", "off": "off",
+}.get(os.getenv("OCR_QUALITY_GATE", "enforce").strip().lower(), "enforce")
+_QUALITY_SHADOW_REASONS = frozenset(
+    r.strip()
+    for r in os.getenv("OCR_QUALITY_SHADOW_REASONS", "blurry,overexposed,glare").split(",")
+    if r.strip()
+)
+_QUALITY_THUMB_LONG_SIDE = 640
+
+_QUALITY_THRESHOLDS = {
+    # Short side of the original image, in pixels.
+    "min_short_side": _env_float("OCR_QUALITY_MIN_SHORT_SIDE", 480),
+    # Variance of the Laplacian on the grayscale thumbnail.
+    "min_sharpness": _env_float("OCR_QUALITY_MIN_SHARPNESS", 40.0),
+    # 99.5th percentile gray level: below this even the brightest parts (paper) are dark.
+    "min_bright_level": _env_float("OCR_QUALITY_MIN_BRIGHT_LEVEL", 90.0),
+    # 0.05th percentile gray level (a few hundred thumbnail pixels, so even a single
+    # line of text counts as ink): above this no dark ink is left, i.e. text is washed out.
+    "max_dark_level": _env_float("OCR_QUALITY_MAX_DARK_LEVEL", 190.0),
+    # Fraction of the image covered by specular highlights (see _glare_ratio).
+    "max_glare_ratio": _env_float("OCR_QUALITY_MAX_GLARE_RATIO", 0.02),
+}
+
+_QUALITY_HINTS = {
+    "low_resolution": "画像の解像度が低すぎます。名刺が画面いっぱいに写るように近づいて撮影してください。",
+    "blurry": "ピントが合っていないか、手ぶれしています。端末を固定してピントを合わせてから撮影してください。",
+    "too_dark": "画像が暗すぎます。明るい場所で撮影してください。",
+    "overexposed": "画像が明るすぎます。直射日光やライトを避けて撮影してください。",
+    "glare": "光の反射（テカリ）があります。角度を少し変えて反射が入らないように撮影してください。",
+}
+
+
+def _gray_percentile(hist: np.ndarray, q: float) -> float:
+    cdf = np.cumsum(hist)
+    return float(np.searchsorted(cdf, q * cdf[-1]))
+
+
+def _glare_ratio(gray: np.ndarray) -> float:
+    """Fraction of the image covered by specular highlights.
+
+    A highlight is a saturated blob that is small relative to the frame and
+    surrounded by bright but unsaturated pixels (card stock). White paper that
+    is saturated as a whole forms one large blob, or is bordered by a darker
+    background, and is not counted.
+    """
+    h, w = gray.shape[:2]
+    total = float(h * w)
+    sat = (gray >= 250).astype(np.uint8)
+    n, labels, comp_stats, _ = cv2.connectedComponentsWithStats(sat, connectivity=8)
+    kernel = np.ones((9, 9), np.uint8)
+    glare = 0
+    for i in range(1, n):
+        x, y, bw, bh, area = comp_stats[i]
+        if not (0.001 * total <= area <= 0.25 * total):
+            continue
+        x0, y0 = max(0, x - 5), max(0, y - 5)
+        x1, y1 = min(w, x + bw + 5), min(h, y + bh + 5)
+        mask = (labels[y0:y1, x0:x1] == i).astype(np.uint8)
+        ring = (cv2.dilate(mask, kernel) > 0) & (mask == 0)
+        if not ring.any():
+            continue
+        around = float(np.median(gray[y0:y1, x0:x1][ring]))
+        if 120.0 <= around < 250.0:
+            glare += int(area)
+    return glare / total
+
+
+def _assess_image_quality(img: np.ndarray) -> dict:
+    """Cheap capture-quality check on a thumbnail, run before any OCR work."""
+    h, w = img.shape[:2]
+    scale = min(1.0, float(_QUALITY_THUMB_LONG_SIDE) / float(max(h, w)))
+    thumb = img
+    if scale < 1.0:
+        thumb = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    metrics = {
+        "short_side": int(min(h, w)),
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        "dark_level": _gray_percentile(hist, 0.0005),
+        "bright_level": _gray_percentile(hist, 0.995),
+        "glare_ratio": _glare_ratio(gray),
+    }
+
+    th = _QUALITY_THRESHOLDS
+    reasons: list[str] = []
+    if metrics["short_side"] < th["min_short_side"]:
+        reasons.append("low_resolution")
+    if metrics["bright_level"] < th["min_bright_level"]:
+        reasons.append("too_dark")
+    elif metrics["dark_level"] > th["max_dark_level"]:
+        reasons.append("overexposed")
+    elif metrics["glare_ratio"] > th["max_glare_ratio"]:
+        reasons.append("glare")
+    # Dark images have little edge energy anyway; only call them blurry when exposure is fine.
+    if metrics["sharpness"] < th["min_sharpness"] and "too_dark" not in reasons:
+        reasons.append("blurry")
+
+    return {
+        "ok": not reasons,
+        "reasons": reasons,
+        "hints": [_QUALITY_HINTS[r] for r in reasons],
+        "metrics": {k: round(v, 3) if isinstance(v, float) else v for k, v in metrics.items()},
+    }
+
+
+def _check_image_quality(img: np.ndarray):
+    q = _assess_image_quality(img)
+    try:
+        print(f"/ocr quality: mode={_QUALITY_GATE_MODE}, ok={q['ok']}, reasons={q['reasons']}, metrics={q['metrics']}")
+    except Exception:
+        pass
+    if q["ok"]:
+        return
+    enforced = [
+        r for r in q["reasons"]
+        if _QUALITY_GATE_MODE == "enforce" and r not in _QUALITY_SHADOW_REASONS
+    ]
+    with _quality_stats_lock:
+        for r in q["reasons"]:
+            key = r if r in enforced else "shadow:" + r
+            _quality_stats[key] = _quality_stats.get(key, 0) + 1
+    if not enforced:
+        return
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail={
+            "code": "low_quality",
+            "reasons": q["reasons"],
+            "hints": q["hints"],
+            "metrics": q["metrics"],
+        },
+    )
+
+
 def _preprocess_for_ocr(img: np.ndarray) -> np.ndarray:
+    return _preprocess_for_ocr_with_transform(img)[0]
+
+
+def _preprocess_for_ocr_with_transform(img: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Preprocess for OCR; also return the 3x3 affine mapping original -> processed pixels."""
+    transform = np.eye(3, dtype=np.float64)
     h, w = img.shape[:2]
     short_side = min(h, w)
     if short_side < 1200:
         scale = 1200.0 / float(short_side)
         img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_CUBIC)
+        transform = np.diag([img.shape[1] / float(w), img.shape[0] / float(h), 1.0]) @ transform
 
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     gray = cv2.GaussianBlur(gray, (3, 3), 0)
@@ -615,6 +1413,7 @@ def _preprocess_for_ocr(img: np.ndarray) -> np.ndarray:
             flags=cv2.INTER_CUBIC,
             borderMode=cv2.BORDER_REPLICATE,
         )
+        transform = np.vstack([M, [0.0, 0.0, 1.0]]) @ transform
 
     lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
     l, a, b = cv2.split(lab)
@@ -622,17 +1421,32 @@ def _preprocess_for_ocr(img: np.ndarray) -> np.ndarray:
     l2 = clahe.apply(l)
     lab2 = cv2.merge((l2, a, b))
     img = cv2.cvtColor(lab2, cv2.COLOR_LAB2BGR)
-    return img
+    return img, transform
+
+
+def _extract_box_from_ocr_line(line, inv_transform: np.ndarray, width: int, height: int) -> list[list[int]] | None:
+    # PaddleOCR lines look like [[[x, y] * 4], (text, score)]; map the quad back to original-image pixels.
+    if not isinstance(line, (list, tuple)) or not line:
+        return None
+    pts = line[0]
+    try:
+        quad = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    except (TypeError, ValueError):
+        return None
+    if quad.shape[0] != 4:
+        return None
+    mapped = (inv_transform @ np.hstack([quad, np.ones((4, 1))]).T).T[:, :2]
+    mapped[:, 0] = np.clip(mapped[:, 0], 0, max(0, width - 1))
+    mapped[:, 1] = np.clip(mapped[:, 1], 0, max(0, height - 1))
+    return [[int(round(x)), int(round(y))] for x, y in mapped]
 
 
 @app.on_event("startup")
 async def _startup_init_ocr():
     try:
-        import asyncio
-
         async def _warmup():
             try:
-                await asyncio.to_thread(_get_ocr)
+                await asyncio.get_running_loop().run_in_executor(_ocr_executor, _get_ocr)
             except Exception:
                 try:
                     print("OCR startup warmup failed:")
@@ -654,6 +1468,24 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/stats")
+async def stats():
+    with _cancel_stats_lock:
+        cancellations = dict(_cancel_stats)
+    with _llm_stats_lock:
+        llm = dict(_llm_stats)
+    llm["latency_ms_total"] = round(llm["latency_ms_total"], 1)
+    with _quality_stats_lock:
+        quality_rejections = dict(_quality_stats)
+    return {
+        "cancellations": cancellations,
+        "ocr_queue": _ocr_scheduler.stats(),
+        "preprocess_queue": _preprocess_scheduler.stats(),
+        "llm": llm,
+        "quality_rejections": quality_rejections,
+    }
+
+
 def _llm_to_blocks(llm: dict) -> list[dict]:
     def _add(out: list[dict], label: str, value: str):
         t = (value or "").strip()
@@ -687,11 +1519,33 @@ def _llm_to_blocks(llm: dict) -> list[dict]:
     return out
 
 
-@app.post("/ocr")
-async def ocr_api(file: UploadFile = File(...), use_llm: bool = False):
+def _decode_and_preprocess(img_bytes: bytes, quality_check: bool) -> tuple[np.ndarray, np.ndarray, int, int]:
+    img_np = np.frombuffer(img_bytes, np.uint8)
+    img = cv2.imdecode(img_np, cv2.IMREAD_COLOR)
+
+    if img is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid image",
+        )
+
+    if quality_check and _QUALITY_GATE_MODE != "off":
+        _check_image_quality(img)
+
+    orig_h, orig_w = img.shape[:2]
+    img, transform = _preprocess_for_ocr_with_transform(img)
+    return img, transform, orig_w, orig_h
 
+
+async def _ocr_upload_to_blocks(
+    file: UploadFile,
+    ctx: _RequestContext,
+    prio: str,
+    quality_check: bool = True,
+    want_boxes: bool = False,
+) -> list[dict]:
     try:
-        print(f"/ocr request: filename={file.filename}, content_type={file.content_type}")
+        print(f"/ocr request: filename={file.filename}, content_type={file.content_type}, priority={prio}")
     except Exception:
         pass
     if file.content_type is None or not file.content_type.startswith("image/"):
@@ -709,20 +1563,25 @@ async def ocr_api(file: UploadFile = File(...), use_llm: bool = False):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Empty file",
         )
-    img_np = np.frombuffer(img_bytes, np.uint8)
-    img = cv2.imdecode(img_np, cv2.IMREAD_COLOR)
-
-    if img is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid image",
-        )
-
-    img = _preprocess_for_ocr(img)
+    img, transform, orig_w, orig_h = await _run_prioritized(
+        _preprocess_scheduler,
+        _preprocess_executor,
+        ctx,
+        prio,
+        "preprocess",
+        "preprocess",
+        _decode_and_preprocess,
+        img_bytes,
+        quality_check,
+    )
+    inv_transform = np.linalg.inv(transform) if want_boxes else None
 
-    ocr = _get_ocr()
     try:
-        result = ocr.ocr(img)
+        result = await _run_prioritized(
+            _ocr_scheduler, _ocr_executor, ctx, prio, "queued", "ocr", _run_ocr_sync, img
+        )
+    except RequestCancelled:
+        raise
     except Exception as e:
         try:
             print("OCR exception:")
@@ -735,7 +1594,7 @@ async def ocr_api(file: UploadFile = File(...), use_llm: bool = False):
         )
 
     if not result or not result[0]:
-        return {"blocks": []}
+        return []
 
     blocks = []
     lines = result[0] if isinstance(result, (list, tuple)) else result
@@ -759,6 +1618,10 @@ async def ocr_api(file: UploadFile = File(...), use_llm: bool = False):
         b = {"text": t}
         if isinstance(score, (int, float)):
             b["confidence"] = float(score)
+        if inv_transform is not None:
+            box = _extract_box_from_ocr_line(line, inv_transform, orig_w, orig_h)
+            if box is not None:
+                b["box"] = box
         blocks.append(b)
 
     try:
@@ -770,6 +1633,89 @@ async def ocr_api(file: UploadFile = File(...), use_llm: bool = False):
         )
     except Exception:
         pass
+    return blocks
+
+
+_MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def _accept_q(accept: str, media_types: tuple[str, ...]) -> float:
+    best = 0.0
+    for part in accept.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if fields[0].lower() not in media_types:
+            continue
+        q = 1.0
+        for f in fields[1:]:
+            if f.lower().startswith("q="):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def _render_response(request: Request, content: dict) -> Response:
+    # MessagePack only when the client explicitly prefers it; JSON (via orjson) otherwise.
+    accept = request.headers.get("accept", "")
+    msgpack_q = _accept_q(accept, _MSGPACK_MEDIA_TYPES)
+    if msgpack_q > 0 and msgpack_q >= _accept_q(accept, ("application/json",)):
+        return MsgPackResponse(content, headers={"Vary": "Accept"})
+    return ORJSONResponse(content, headers={"Vary": "Accept"})
+
+
+def _llm_error_from_exception(e: Exception) -> dict:
+    if isinstance(e, HTTPException):
+        return {
+            "status_code": int(getattr(e, "status_code", 0) or 0),
+            "detail": getattr(e, "detail", None),
+            "type": type(e).__name__,
+        }
+    return {
+        "detail": str(e),
+        "type": type(e).__name__,
+    }
+
+
+def _attach_llm(resp: dict, llm: dict | None, llm_error: dict | None):
+    resp["llm"] = llm
+    if llm is None:
+        resp["llm_error"] = llm_error
+        return
+    try:
+        print("/ocr llm: " + json.dumps(llm, ensure_ascii=False)[:8000])
+    except Exception:
+        pass
+    llm_blocks = _llm_to_blocks(llm)
+    if llm_blocks:
+        resp["blocks"] = llm_blocks + resp["blocks"]
+
+
+@app.post("/ocr")
+async def ocr_api(
+    request: Request,
+    file: UploadFile = File(...),
+    use_llm: bool = False,
+    priority: str | None = None,
+    quality_check: bool = True,
+    boxes: bool = False,
+    x_request_timeout_ms: str | None = Header(None),
+    x_priority: str | None = Header(None),
+):
+    ctx = _RequestContext(request, _parse_timeout_ms(x_request_timeout_ms))
+    prio = _parse_priority(priority or x_priority)
+
+    blocks = await _ocr_upload_to_blocks(file, ctx, prio, quality_check, boxes)
+    if not blocks:
+        return _render_response(request, {"blocks": []})
 
     resp = {"blocks": blocks}
     if use_llm:
@@ -779,37 +1725,77 @@ async def ocr_api(file: UploadFile = File(...), use_llm: bool = False):
             pass
 
         try:
-            llm = await _openai_extract_card_from_blocks(blocks)
-        except HTTPException as e:
-            try:
-                print("/ocr llm exception:")
-                print(traceback.format_exc())
-            except Exception:
-                pass
-            resp["llm"] = None
-            resp["llm_error"] = {
-                "status_code": int(getattr(e, "status_code", 0) or 0),
-                "detail": getattr(e, "detail", None),
-                "type": type(e).__name__,
-            }
+            await ctx.check("llm")
+            llm = await ctx.run(_openai_extract_card_from_blocks(blocks), "llm")
+        except RequestCancelled:
+            raise
         except Exception as e:
             try:
                 print("/ocr llm exception:")
                 print(traceback.format_exc())
             except Exception:
                 pass
-            resp["llm"] = None
-            resp["llm_error"] = {
-                "detail": str(e),
-                "type": type(e).__name__,
-            }
+            _attach_llm(resp, None, _llm_error_from_exception(e))
         else:
-            resp["llm"] = llm
+            _attach_llm(resp, llm, None)
+    return _render_response(request, resp)
+
+
+@app.post("/ocr/batch")
+async def ocr_batch_api(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    use_llm: bool = False,
+    priority: str | None = None,
+    quality_check: bool = True,
+    boxes: bool = False,
+    x_request_timeout_ms: str | None = Header(None),
+    x_priority: str | None = Header(None),
+):
+    """OCR several cards; with use_llm, extract them with batched LLM requests."""
+    ctx = _RequestContext(request, _parse_timeout_ms(x_request_timeout_ms))
+    # Bulk scans can wait behind interactive ones unless the caller says otherwise.
+    prio = _parse_priority(priority or x_priority or "bulk")
+
+    limit = asyncio.Semaphore(_OCR_BATCH_CONCURRENCY)
+
+    async def _one(f: UploadFile) -> list[dict]:
+        async with limit:
+            return await _ocr_upload_to_blocks(f, ctx, prio, quality_check, boxes)
+
+    outcomes = await asyncio.gather(*(_one(f) for f in files), return_exceptions=True)
+    for o in outcomes:
+        if isinstance(o, RequestCancelled):
+            raise o
+
+    cards: list[dict] = []
+    for f, o in zip(files, outcomes):
+        card = {"filename": f.filename}
+        if isinstance(o, BaseException):
+            card["blocks"] = []
+            card["error"] = _llm_error_from_exception(o)
+        else:
+            card["blocks"] = o
+        cards.append(card)
+
+    if use_llm:
+        todo = [i for i, c in enumerate(cards) if c["blocks"]]
+        try:
+            await ctx.check("llm")
+            extracted = await ctx.run(
+                _openai_extract_cards_batch([cards[i]["blocks"] for i in todo]),
+                "llm",
+            )
+        except RequestCancelled:
+            raise
+        except Exception as e:
             try:
-                print("/ocr llm: " + json.dumps(llm, ensure_ascii=False)[:8000])
+                print("/ocr/batch llm exception:")
+                print(traceback.format_exc())
             except Exception:
                 pass
-            llm_blocks = _llm_to_blocks(llm)
-            if llm_blocks:
-                resp["blocks"] = llm_blocks + blocks
-    return resp
\ No newline at end of file
+            err = _llm_error_from_exception(e)
+            extracted = [(None, err)] * len(todo)
+        for i, (llm, llm_error) in zip(todo, extracted):
+            _attach_llm(cards[i], llm, llm_error)
+    return _render_response(request, {"cards": cards})
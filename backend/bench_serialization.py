@@ -0,0 +1,84 @@
+"""Compare /ocr response serialization: current JSON path vs orjson vs MessagePack.
+
+    python bench_serialization.py [--blocks 30] [--number 2000]
+
+"The current path" is what FastAPI did for a plain dict return value:
+jsonable_encoder followed by JSONResponse's json.dumps.
+"""
+
+import argparse
+import random
+import timeit
+
+import msgpack
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+_SAMPLE_TEXTS = [
+    "株式会社サンプル商事",
+    "営業本部 第二営業部",
+    "課長",
+    "山田 太郎",
+    "〒100-0001",
+    "東京都千代田区千代田1-1-1 サンプルビル5F",
+    "03-1234-5678",
+    "03-1234-5679",
+    "090-1234-5678",
+    "taro.yamada@example.co.jp",
+    "https://www.example.co.jp",
+]
+
+
+def _sample_response(n_blocks: int, with_boxes: bool) -> dict:
+    rnd = random.Random(0)
+    blocks = []
+    for i in range(n_blocks):
+        b = {"text": _SAMPLE_TEXTS[i % len(_SAMPLE_TEXTS)], "confidence": rnd.uniform(0.6, 1.0)}
+        if with_boxes:
+            x, y = rnd.randint(0, 3000), rnd.randint(0, 2000)
+            b["box"] = [[x, y], [x + 400, y + 3], [x + 398, y + 60], [x - 2, y + 57]]
+        blocks.append(b)
+    llm = {
+        "name": "山田 太郎",
+        "company": "株式会社サンプル商事",
+        "department": "営業本部 第二営業部",
+        "title": "課長",
+        "phones": ["03-1234-5678"],
+        "mobiles": ["090-1234-5678"],
+        "faxes": ["03-1234-5679"],
+        "emails": ["taro.yamada@example.co.jp"],
+        "urls": ["https://www.example.co.jp"],
+        "postal_code": "100-0001",
+        "address": "東京都千代田区千代田1-1-1 サンプルビル5F",
+        "other": [],
+    }
+    return {"blocks": blocks, "llm": llm}
+
+
+def _serializers() -> dict:
+    json_response = JSONResponse(content=None)
+    return {
+        "json (current)": lambda c: json_response.render(jsonable_encoder(c)),
+        "orjson": lambda c: orjson.dumps(c),
+        "msgpack": lambda c: msgpack.packb(c, use_bin_type=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=30)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    for with_boxes in (False, True):
+        content = _sample_response(args.blocks, with_boxes)
+        print(f"blocks={args.blocks}, boxes={with_boxes}")
+        for name, fn in _serializers().items():
+            size = len(fn(content))
+            sec = min(timeit.repeat(lambda: fn(content), number=args.number, repeat=3))
+            print(f"  {name:<15} {sec / args.number * 1e6:8.1f} us  {size:6d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Inference runtime tuning for the OCR server.
+
+The app reads the calibrated profile for the current machine at startup (see
+load_runtime_config / apply_runtime_env). Profiles are produced by:
+
+    python runtime_tuning.py calibrate --cards ./cards --out runtime_tuning.json
+
+which benchmarks intra-op threads, OpenCV threads, MKL-DNN on/off and worker
+count on a fixed card set, each combination in fresh processes.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+_DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtime_tuning.json")
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def _pick_profile(profiles: dict, cpus: int) -> dict:
+    sizes = sorted(int(k) for k in profiles if str(k).isdigit())
+    if not sizes:
+        return {}
+    fitting = [n for n in sizes if n <= cpus]
+    if not fitting:
+        # Profiles tuned for bigger machines would oversubscribe this one; use the safe defaults.
+        return {}
+    return dict(profiles.get(str(fitting[-1])) or {})
+
+
+def load_runtime_config(path: str | None = None) -> dict:
+    """Return the tuned profile for this machine, or {} when none is available."""
+    path = path or os.getenv("OCR_RUNTIME_CONFIG", "").strip() or _DEFAULT_CONFIG_PATH
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        try:
+            print(f"runtime config load failed ({path}): {type(e).__name__}: {e}")
+        except Exception:
+            pass
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    if "profiles" in data:
+        if not isinstance(data["profiles"], dict):
+            return {}
+        return _pick_profile(data["profiles"], _cpu_count())
+    return data
+
+
+def apply_runtime_env(cfg: dict):
+    """Export thread/MKL-DNN settings; must run before paddle/numpy are imported.
+
+    Variables already set in the environment win over the profile.
+    """
+    threads = cfg.get("intra_op_threads")
+    if isinstance(threads, int) and threads > 0:
+        for name in _THREAD_ENV_VARS:
+            os.environ.setdefault(name, str(threads))
+    mkldnn = cfg.get("mkldnn")
+    if isinstance(mkldnn, bool):
+        os.environ.setdefault("FLAGS_use_mkldnn", "1" if mkldnn else "0")
+
+
+def _list_cards(cards_dir: str) -> list[str]:
+    paths = [
+        os.path.join(cards_dir, n)
+        for n in sorted(os.listdir(cards_dir))
+        if n.lower().endswith(_IMAGE_EXTS)
+    ]
+    if not paths:
+        raise SystemExit(f"no card images found in {cards_dir}")
+    return paths
+
+
+def _bench_worker(cards_dir: str, rounds: int, control_fd: int, result_file: str):
+    # Runs in a child process whose environment and OCR_RUNTIME_CONFIG describe
+    # the candidate, so the app's own startup path applies it. stdout is
+    # discarded by the parent (the app and PaddleOCR log there); the handshake
+    # goes over control_fd and the measurements into result_file.
+    #
+    # Each card goes through the same executors as an upload to the server:
+    # decode + preprocess on the preprocess pool, then OCR on the single OCR
+    # thread, with enough cards in flight to keep both busy. That way the
+    # OpenCV and inference threads compete for cores as they do in production.
+    from concurrent.futures import ThreadPoolExecutor
+
+    import app
+
+    payloads: list[bytes] = []
+    for path in _list_cards(cards_dir):
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+
+    def one_card(data: bytes) -> float:
+        t0 = time.perf_counter()
+        img, _, _, _ = app._preprocess_executor.submit(app._decode_and_preprocess, data, False).result()
+        app._ocr_executor.submit(app._run_ocr_sync, img).result()
+        return (time.perf_counter() - t0) * 1000.0
+
+    one_card(payloads[0])
+
+    with os.fdopen(control_fd, "w") as control:
+        control.write("ready\n")
+    sys.stdin.readline()
+
+    in_flight = app._PREPROCESS_SLOTS + 1
+    with ThreadPoolExecutor(max_workers=in_flight) as driver:
+        latencies = list(driver.map(one_card, payloads * rounds))
+    end = time.time()
+
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({"latencies": latencies, "end": end}, f)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    s = sorted(values)
+    if not s:
+        return 0.0
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def _run_candidate(cand: dict, cards_dir: str, rounds: int) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="runtime_tuning_")
+    cfg_path = os.path.join(tmpdir, "candidate.json")
+    with open(cfg_path, "w", encoding="utf-8") as f:
+        json.dump(cand, f)
+
+    env = dict(os.environ)
+    for name in _THREAD_ENV_VARS:
+        env[name] = str(cand["intra_op_threads"])
+    env["FLAGS_use_mkldnn"] = "1" if cand["mkldnn"] else "0"
+    env["OCR_RUNTIME_CONFIG"] = cfg_path
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    procs: list[tuple[subprocess.Popen, int, str]] = []
+    try:
+        for i in range(cand["workers"]):
+            r_fd, w_fd = os.pipe()
+            result_file = os.path.join(tmpdir, f"result-{i}.json")
+            try:
+                p = subprocess.Popen(
+                    [
+                        sys.executable, os.path.abspath(__file__), "_bench",
+                        "--cards", cards_dir,
+                        "--rounds", str(rounds),
+                        "--control-fd", str(w_fd),
+                        "--result-file", result_file,
+                    ],
+                    cwd=here,
+                    env=env,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    text=True,
+                    pass_fds=(w_fd,),
+                )
+            except BaseException:
+                os.close(r_fd)
+                raise
+            finally:
+                os.close(w_fd)
+            procs.append((p, r_fd, result_file))
+
+        # Start timing only once every worker has loaded its model.
+        for p, r_fd, _ in procs:
+            with os.fdopen(r_fd, "r", closefd=False) as control:
+                if not control.readline().startswith("ready"):
+                    raise RuntimeError(f"benchmark worker exited early (code {p.wait()})")
+        t0 = time.time()
+        for p, _, _ in procs:
+            p.stdin.write("go\n")
+            p.stdin.flush()
+
+        latencies: list[float] = []
+        end = t0
+        for p, _, result_file in procs:
+            if p.wait() != 0:
+                raise RuntimeError(f"benchmark worker failed (code {p.returncode})")
+            with open(result_file, encoding="utf-8") as f:
+                res = json.load(f)
+            latencies.extend(res["latencies"])
+            end = max(end, float(res["end"]))
+        wall = end - t0
+    finally:
+        for p, r_fd, _ in procs:
+            os.close(r_fd)
+            if p.poll() is None:
+                p.kill()
+                p.wait()
+            p.stdin.close()
+        for name in os.listdir(tmpdir):
+            os.unlink(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+    if not latencies or wall <= 0:
+        raise RuntimeError(f"benchmark produced no results for {cand}")
+    return {
+        "throughput_cps": round(len(latencies) / wall, 3),
+        "p50_ms": round(_percentile(latencies, 0.5), 1),
+        "p95_ms": round(_percentile(latencies, 0.95), 1),
+    }
+
+
+def _candidates(cpus: int, args) -> list[dict]:
+    threads = sorted({t for t in (args.threads or [1, 2, 4, cpus]) if 0 < t <= cpus})
+    cv_threads = sorted({t for t in (args.opencv_threads or [1, cpus]) if 0 < t <= cpus})
+    workers = sorted({w for w in (args.workers or [1, 2, 4, cpus]) if 0 < w <= cpus})
+    out: list[dict] = []
+    for w in workers:
+        for t in threads:
+            # Don't oversubscribe the machine with inference threads.
+            if w * t > cpus:
+                continue
+            for c in cv_threads:
+                for m in (False, True):
+                    out.append({"intra_op_threads": t, "opencv_threads": c, "mkldnn": m, "workers": w})
+    return out
+
+
+def _choose(results: list[dict], latency_slack: float) -> dict:
+    # Best throughput among candidates whose p95 latency stays close to the best p95.
+    best_p95 = min(r["measured"]["p95_ms"] for r in results)
+    ok = [r for r in results if r["measured"]["p95_ms"] <= best_p95 * (1.0 + latency_slack)]
+    return max(ok, key=lambda r: r["measured"]["throughput_cps"])
+
+
+def calibrate(args):
+    cpus = _cpu_count()
+    cards_dir = os.path.abspath(args.cards)
+    _list_cards(cards_dir)
+
+    results: list[dict] = []
+    for cand in _candidates(cpus, args):
+        try:
+            measured = _run_candidate(cand, cards_dir, args.rounds)
+        except Exception as e:
+            print(f"skip {cand}: {type(e).__name__}: {e}")
+            continue
+        print(f"{cand} -> {measured}")
+        results.append({**cand, "measured": measured})
+    if not results:
+        raise SystemExit("no candidate could be benchmarked")
+
+    best = _choose(results, args.latency_slack)
+    best["calibrated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    print(f"best for {cpus} CPUs: {best}")
+
+    # Keep profiles calibrated on other instance sizes.
+    data: dict = {"profiles": {}}
+    try:
+        with open(args.out, encoding="utf-8") as f:
+            loaded = json.load(f)
+        if isinstance(loaded, dict) and isinstance(loaded.get("profiles"), dict):
+            data = loaded
+    except FileNotFoundError:
+        pass
+    data["profiles"][str(cpus)] = best
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("calibrate", help="benchmark runtime settings and write the best profile")
+    p.add_argument("--cards", required=True, help="directory with sample card images")
+    p.add_argument("--out", default=_DEFAULT_CONFIG_PATH)
+    p.add_argument("--rounds", type=int, default=3)
+    p.add_argument("--threads", type=int, nargs="*")
+    p.add_argument("--opencv-threads", type=int, nargs="*")
+    p.add_argument("--workers", type=int, nargs="*")
+    p.add_argument("--latency-slack", type=float, default=0.25,
+                   help="accepted p95 latency above the best candidate's (fraction)")
+
+    sub.add_parser("workers", help="print the tuned worker count for this machine")
+
+    b = sub.add_parser("_bench")
+    b.add_argument("--cards", required=True)
+    b.add_argument("--rounds", type=int, default=3)
+    b.add_argument("--control-fd", type=int, required=True)
+    b.add_argument("--result-file", required=True)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "calibrate":
+        calibrate(args)
+    elif args.cmd == "workers":
+        w = load_runtime_config().get("workers")
+        print(w if isinstance(w, int) and w > 0 else 1)
+    else:
+        _bench_worker(args.cards, args.rounds, args.control_fd, args.result_file)
+
+
+if __name__ == "__main__":
+    main()
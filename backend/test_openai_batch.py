@@ -0,0 +1,153 @@
+"""Batch LLM extraction against a local mock of the chat completions endpoint.
+
+Run with pytest, or directly: python test_openai_batch.py
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastapi import HTTPException
+
+import app
+
+_CARD_RE = re.compile(r"=== card (\d+) ===")
+
+
+def _blocks(i: int) -> list[dict]:
+    return [{"text": f"Person {i}", "confidence": 0.99}, {"text": "03-1234-5678", "confidence": 0.98}]
+
+
+def _entry(i: int, with_index: bool = True) -> dict:
+    entry = {"name": f"Person {i}", "company": "Example", "phones": ["03-1234-5678"]}
+    if with_index:
+        entry["card"] = i
+    return entry
+
+
+@contextlib.contextmanager
+def _mock_openai(respond, delay: float = 0.0):
+    """Serve /chat/completions with respond(attempt, indices) -> {"cards": [...]}.
+
+    Yields the list of (attempt, indices) requests seen, in arrival order, and a
+    dict holding the highest number of requests in flight at once.
+    """
+    calls: list[tuple[int, list[int]]] = []
+    seen: dict[tuple[int, ...], int] = {}
+    state = {"in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            user = next(m["content"] for m in body["messages"] if m["role"] == "user")
+            indices = [int(n) for n in _CARD_RE.findall(user)]
+            with lock:
+                attempt = sum(1 for _, prev in calls if set(prev) & set(indices)) + 1
+                calls.append((attempt, indices))
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            time.sleep(delay)
+            content = json.dumps(respond(attempt, indices), ensure_ascii=False)
+            payload = {
+                "choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 10},
+            }
+            data = json.dumps(payload).encode("utf-8")
+            with lock:
+                state["in_flight"] -= 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    saved = {k: os.environ.get(k) for k in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+    os.environ["OPENAI_API_KEY"] = "test"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    try:
+        yield calls, state
+    finally:
+        server.shutdown()
+        server.server_close()
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def _extract(n: int):
+    return asyncio.run(app._openai_extract_cards_batch([_blocks(i) for i in range(n)]))
+
+
+def test_splits_by_card_index():
+    # Entries come back out of order; the "card" index decides where they go.
+    with _mock_openai(lambda attempt, idx: {"cards": [_entry(i) for i in reversed(idx)]}):
+        results = _extract(3)
+    assert [llm["name"] for llm, err in results] == ["Person 0", "Person 1", "Person 2"]
+    assert all(err is None for _, err in results)
+
+
+def test_positional_fallback():
+    with _mock_openai(lambda attempt, idx: {"cards": [_entry(i, with_index=False) for i in idx]}):
+        results = _extract(3)
+    assert [llm["name"] for llm, err in results] == ["Person 0", "Person 1", "Person 2"]
+
+
+def test_only_failed_cards_are_resubmitted():
+    def respond(attempt, idx):
+        if attempt == 1:
+            # Card 1 is missing and card 2 is unusable.
+            return {"cards": [_entry(0), "not a card", _entry(3)]}
+        return {"cards": [_entry(i) for i in idx]}
+
+    with _mock_openai(respond) as (calls, _):
+        results = _extract(4)
+    assert [indices for attempt, indices in calls if attempt == 2] == [[1, 2]]
+    assert [llm["name"] for llm, err in results] == [f"Person {i}" for i in range(4)]
+
+
+def test_missing_api_key_is_raised():
+    with _mock_openai(lambda attempt, idx: {"cards": []}) as (calls, _):
+        os.environ.pop("OPENAI_API_KEY")
+        try:
+            _extract(2)
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("missing OPENAI_API_KEY was not raised")
+    assert calls == []
+
+
+def test_chunks_run_concurrently():
+    size = app._LLM_BATCH_SIZE
+    app._LLM_BATCH_SIZE = 2
+    try:
+        with _mock_openai(lambda attempt, idx: {"cards": [_entry(i) for i in idx]}, delay=0.2) as (calls, state):
+            results = _extract(6)
+    finally:
+        app._LLM_BATCH_SIZE = size
+    assert len(calls) == 3
+    assert state["max_in_flight"] == min(3, app._LLM_BATCH_CONCURRENCY)
+    assert all(err is None for _, err in results)
+
+
+if __name__ == "__main__":
+    test_splits_by_card_index()
+    test_positional_fallback()
+    test_only_failed_cards_are_resubmitted()
+    test_missing_api_key_is_raised()
+    test_chunks_run_concurrently()
+    print("ok")
@@ -0,0 +1,138 @@
+"""Known JP numbers per region and service, checked against the numbering-plan trie.
+
+Run with pytest, or directly: python test_phone_format.py
+"""
+
+from app import _looks_like_phone, _normalize_phone_text
+
+# (OCR text, expected formatting). Digits after the area code are arbitrary
+# where no public number is used; what matters is the area-code split.
+KNOWN_NUMBERS = [
+    # Hokkaido / Tohoku
+    ("0112345678", "011-234-5678"),
+    ("0123456789", "0123-45-6789"),
+    ("0138123456", "0138-12-3456"),
+    ("0126712345", "01267-1-2345"),
+    ("0177234567", "017-723-4567"),
+    ("0178123456", "0178-12-3456"),
+    ("0222345678", "022-234-5678"),
+    ("0225123456", "0225-12-3456"),
+    ("0246123456", "0246-12-3456"),
+    # Kanto
+    ("0312345678", "03-1234-5678"),
+    ("0422515131", "0422-51-5131"),
+    ("0428123456", "0428-12-3456"),
+    ("0426123456", "042-612-3456"),
+    ("0429531111", "04-2953-1111"),
+    ("0432123456", "043-212-3456"),
+    ("0436123456", "0436-12-3456"),
+    ("0438237111", "0438-23-7111"),
+    ("0439561581", "0439-56-1581"),
+    ("0452123456", "045-212-3456"),
+    ("0465123456", "0465-12-3456"),
+    ("0471234567", "04-7123-4567"),
+    ("0473123456", "047-312-3456"),
+    ("0476123456", "0476-12-3456"),
+    ("0482123456", "048-212-3456"),
+    ("0492123456", "049-212-3456"),
+    ("0499212345", "04992-1-2345"),
+    ("0272123456", "027-212-3456"),
+    ("0276123456", "0276-12-3456"),
+    ("0292123456", "029-212-3456"),
+    # Chubu
+    ("0521234567", "052-123-4567"),
+    ("0532123456", "0532-12-3456"),
+    ("0542123456", "054-212-3456"),
+    ("0564123456", "0564-12-3456"),
+    ("0582123456", "058-212-3456"),
+    ("0762123456", "076-212-3456"),
+    ("0766123456", "0766-12-3456"),
+    ("0776123456", "0776-12-3456"),
+    # Kinki
+    ("0612345678", "06-1234-5678"),
+    ("0722123456", "072-212-3456"),
+    ("0725123456", "0725-12-3456"),
+    ("0742123456", "0742-12-3456"),
+    ("0743551234", "0743-55-1234"),
+    ("0752123456", "075-212-3456"),
+    ("0782123456", "078-212-3456"),
+    ("0792123456", "079-212-3456"),
+    ("0798123456", "0798-12-3456"),
+    # Chugoku / Shikoku
+    ("0822123456", "082-212-3456"),
+    ("0823123456", "0823-12-3456"),
+    ("0852123456", "0852-12-3456"),
+    ("0862123456", "086-212-3456"),
+    ("0878123456", "087-812-3456"),
+    ("0886123456", "088-612-3456"),
+    ("0899123456", "089-912-3456"),
+    ("0898123456", "0898-12-3456"),
+    # Kyushu / Okinawa
+    ("0922123456", "092-212-3456"),
+    ("0942123456", "0942-12-3456"),
+    ("0952123456", "0952-12-3456"),
+    ("0954123456", "0954-12-3456"),
+    ("0958123456", "095-812-3456"),
+    ("0962123456", "096-212-3456"),
+    ("0985123456", "0985-12-3456"),
+    ("0988123456", "098-812-3456"),
+    ("0992123456", "099-212-3456"),
+    ("0991212345", "09912-1-2345"),
+    # 4-digit prefixes shared between a 3-digit and a 4-digit area code
+    ("0154235151", "0154-23-5151"),
+    ("0154822191", "015-482-2191"),
+    ("0155244111", "0155-24-4111"),
+    ("0155723111", "015-572-3111"),
+    ("0196513111", "019-651-3111"),
+    ("0223221111", "0223-22-1111"),
+    ("0223341111", "0223-34-1111"),
+    ("0223643111", "022-364-3111"),
+    ("0223723111", "022-372-3111"),
+    ("0255723111", "0255-72-3111"),
+    ("0255265111", "025-526-5111"),
+    ("0255521511", "025-552-1511"),
+    ("0257235111", "0257-23-5111"),
+    ("0257573111", "025-757-3111"),
+    ("0429981111", "04-2998-1111"),
+    ("0429732111", "042-973-2111"),
+    ("0539220011", "053-922-0011"),
+    ("0794822000", "0794-82-2000"),
+    ("0794212000", "079-421-2000"),
+    ("0794422101", "079-442-2101"),
+    ("0795221300", "0795-22-1300"),
+    ("0795631111", "079-563-1111"),
+    ("0796231111", "0796-23-1111"),
+    ("0796623161", "079-662-3161"),
+    ("0829200001", "0829-20-0001"),
+    ("0829211234", "082-921-1234"),
+    ("0746821234", "07468-2-1234"),
+    ("0851321234", "08513-2-1234"),
+    # Non-geographic
+    ("09012345678", "090-1234-5678"),
+    ("08012345678", "080-1234-5678"),
+    ("07012345678", "070-1234-5678"),
+    ("05012345678", "050-1234-5678"),
+    ("02012345678", "020-1234-5678"),
+    ("0120123456", "0120-123-456"),
+    ("08001234567", "0800-123-4567"),
+    ("0570012345", "0570-01-2345"),
+    # Already hyphenated by OCR, labelled, or with hallucinated leading digits
+    ("0422-51-5131", "0422-51-5131"),
+    ("FAX 06(6123)4567", "06-6123-4567"),
+    ("4074355123 4", "0743-55-1234"),
+    ("430743551234", "0743-55-1234"),
+]
+
+
+def test_known_numbers():
+    failures = []
+    for text, expected in KNOWN_NUMBERS:
+        got = _normalize_phone_text(text)
+        if got != expected or not _looks_like_phone(text):
+            failures.append(f"{text!r}: got {got!r}, expected {expected!r}")
+    assert not failures, "\n".join(failures)
+
+
+if __name__ == "__main__":
+    test_known_numbers()
+    print(f"ok ({len(KNOWN_NUMBERS)} numbers)")
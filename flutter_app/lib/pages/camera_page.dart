@@ -3,6 +3,7 @@
 import 'package:camera/camera.dart';
 import 'package:flutter/material.dart';
 import 'package:flutter/services.dart';
+import 'package:http/http.dart' as http;
 
 import '../services/api.dart';
 import 'edit_page_fixed.dart';
@@ -23,6 +24,7 @@ class _CameraPageState extends State<CameraPage> {
   bool _isOcrRunning = false;
   bool _isTakingPicture = false;
   String? _cameraInitError;
+  http.Client? _ocrClient;
 
   Widget _buildGuideFrame(BoxConstraints constraints, Orientation orientation) {
     final maxW = constraints.maxWidth;
@@ -101,6 +103,8 @@ class _CameraPageState extends State<CameraPage> {
 
   @override
   void dispose() {
+    // 画面を離れたら実行中のOCRリクエストを中断する（サーバ側も処理を打ち切る）。
+    _ocrClient?.close();
     _controller?.dispose();
     super.dispose();
   }
@@ -157,8 +161,10 @@ class _CameraPageState extends State<CameraPage> {
       _isOcrRunning = true;
     });
 
+    final client = http.Client();
+    _ocrClient = client;
     try {
-      final result = await uploadImage(path);
+      final result = await uploadImage(path, client: client);
       final dynamic rawBlocks = result['blocks'];
       final List<dynamic> blocks =
           rawBlocks is List ? List<dynamic>.from(rawBlocks) : const <dynamic>[];
@@ -177,6 +183,12 @@ class _CameraPageState extends State<CameraPage> {
       setState(() {
         _capturedImagePath = null;
       });
+    } on OcrQualityException catch (e) {
+      if (!mounted) return;
+      debugPrint('OCR rejected by quality gate: ${e.reasons}');
+      ScaffoldMessenger.of(context).showSnackBar(
+        SnackBar(content: Text(e.toString())),
+      );
     } catch (e, st) {
       if (!mounted) return;
       debugPrint('OCR error: $e\n$st');
@@ -184,6 +196,10 @@ class _CameraPageState extends State<CameraPage> {
         SnackBar(content: Text('OCR error: $e')),
       );
     } finally {
+      if (identical(_ocrClient, client)) {
+        _ocrClient = null;
+      }
+      client.close();
       if (mounted) {
         setState(() {
           _isOcrRunning = false;
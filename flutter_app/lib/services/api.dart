@@ -16,7 +16,44 @@ const String _ocrApiBaseUrl = String.fromEnvironment(
 
 const bool _useLlm = bool.fromEnvironment('USE_LLM', defaultValue: true);
 
-Future<Map<String, dynamic>> uploadImage(String path) async {
+const Duration _ocrTimeout = Duration(seconds: 60);
+
+/// 撮影画像の品質（ピンぼけ・暗さ・反射など）が悪く、OCR前にサーバで弾かれたことを表す。
+class OcrQualityException implements Exception {
+  final List<String> reasons;
+  final List<String> hints;
+
+  OcrQualityException({required this.reasons, required this.hints});
+
+  @override
+  String toString() => hints.isNotEmpty
+      ? hints.join('\n')
+      : '画像の品質が低いため読み取れませんでした。撮り直してください。';
+}
+
+OcrQualityException? _parseQualityRejection(String body) {
+  try {
+    final decoded = json.decode(body);
+    if (decoded is! Map) return null;
+    final detail = decoded['detail'];
+    if (detail is! Map || detail['code'] != 'low_quality') return null;
+    List<String> strings(dynamic v) =>
+        v is List ? v.map((e) => e.toString()).toList() : <String>[];
+    return OcrQualityException(
+      reasons: strings(detail['reasons']),
+      hints: strings(detail['hints']),
+    );
+  } catch (_) {
+    return null;
+  }
+}
+
+/// [client] を渡した場合、呼び出し側が client.close() するとリクエストが中断され、
+/// サーバ側でも処理が打ち切られる。
+Future<Map<String, dynamic>> uploadImage(
+  String path, {
+  http.Client? client,
+}) async {
   final f = File(path);
 
   if (!await f.exists()) {
@@ -35,6 +72,8 @@ Future<Map<String, dynamic>> uploadImage(String path) async {
   final uri = Uri.parse('$base/ocr').replace(
     queryParameters: <String, String>{
       'use_llm': _useLlm ? 'true' : 'false',
+      // カメラからの単発スキャンは一括処理より優先して処理される。
+      'priority': 'interactive',
     },
   );
 
@@ -49,6 +88,8 @@ Future<Map<String, dynamic>> uploadImage(String path) async {
   final req = http.MultipartRequest('POST', uri);
 
   req.headers['Accept'] = 'application/json';
+  // サーバ側のデッドライン。これを過ぎた処理はサーバで破棄される。
+  req.headers['X-Request-Timeout-Ms'] = '${_ocrTimeout.inMilliseconds}';
 
   req.files.add(
     await http.MultipartFile.fromPath(
@@ -61,7 +102,8 @@ Future<Map<String, dynamic>> uploadImage(String path) async {
 
   http.StreamedResponse res;
   try {
-    res = await req.send().timeout(const Duration(seconds: 60));
+    res = await (client != null ? client.send(req) : req.send())
+        .timeout(_ocrTimeout);
   } catch (e, st) {
     throw Exception('OCR request failed: $e (url=$uri)\n$st');
   }
@@ -74,6 +116,11 @@ Future<Map<String, dynamic>> uploadImage(String path) async {
 
   final status = res.statusCode;
 
+  if (status == 422) {
+    final rejection = _parseQualityRejection(body);
+    if (rejection != null) throw rejection;
+  }
+
   if (status < 200 || status >= 300) {
     throw Exception(
       'OCR request failed ($status): $body (url=$uri, path=$path, size=$size)',